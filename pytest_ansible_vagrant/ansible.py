@@ -1,45 +1,117 @@
 from __future__ import annotations
 
+import atexit
+import functools
 import os
+import shutil
 import tempfile
-from typing import Any
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
 
 from ansible_runner import Runner, RunnerConfig
 
 from pytest_ansible_vagrant.utilities import extract_play_hosts
 from pytest_ansible_vagrant.runner import SSHConfig
 
+# Ansible already multiplexes; the ControlPath puts the sockets in a dir that
+# VagrantRunner.close() can shut down. The socket path must fit in sun_path
+# (108 bytes) after ssh appends its temporary suffix, so cm_dir is kept short.
+_SSH_COMMON_ARGS = (
+    "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null "
+    "-o ControlPath={cm_dir}/cm-%C"
+)
+
+# ssh keeps the first value of an option and ansible places ssh_args before
+# ansible_ssh_common_args, so ControlPersist is only honoured in ssh_args.
+# This is ansible's default ssh_args with a longer persist, so masters survive
+# the gap between playbooks.
+_SSH_ARGS = "-C -o ControlMaster=auto -o ControlPersist=600s"
+
+_PYTHON_INTERPRETER = "/usr/bin/python3"
+
+_INVENTORY_LINE = (
+    "{name} "
+    "ansible_host={hostname} "
+    "ansible_port={port} "
+    "ansible_user={user} "
+    "ansible_ssh_private_key_file={identityfile} "
+    "ansible_ssh_common_args='{ssh_common_args}' "
+    f"ansible_python_interpreter={_PYTHON_INTERPRETER}"
+)
+
+_STATIC_SSH_VARS = {
+    "ansible_python_interpreter": _PYTHON_INTERPRETER,
+}
+
+
+def _tuned_envvars(host_count: int = 1, reuse_facts: bool = False) -> dict[str, str]:
+    """
+    Ansible settings that cut per-task SSH round-trips. Forks cover every host
+    so one run executes each task on all VMs at once; with reuse_facts, facts
+    already in the fact cache are not gathered again. Settings the user has
+    exported are left alone, since ansible-runner applies these over os.environ.
+    """
+    tuned = {
+        "ANSIBLE_SSH_ARGS": _SSH_ARGS,
+        "ANSIBLE_PIPELINING": "True",
+        "ANSIBLE_FORKS": str(max(20, host_count)),
+    }
+    if reuse_facts:
+        tuned["ANSIBLE_GATHERING"] = "smart"
+        tuned["ANSIBLE_CACHE_PLUGIN_TIMEOUT"] = "7200"
+    return {k: v for k, v in tuned.items() if k not in os.environ}
+
 
 def _build_inventory_content(
     ssh_configs: dict[str, SSHConfig],
     host_patterns: list[str] | None = None,
+    ssh_common_args: str = "",
 ) -> str:
-    lines = ["[vagrant]"]
-
     if len(ssh_configs) == 1 and host_patterns:
         cfg = next(iter(ssh_configs.values()))
-        for pattern in host_patterns:
-            lines.append(
-                f"{pattern} "
-                f"ansible_host={cfg['hostname']} "
-                f"ansible_port={cfg['port']} "
-                f"ansible_user={cfg['user']} "
-                f"ansible_ssh_private_key_file={cfg['identityfile']} "
-                f"ansible_ssh_common_args='-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null' "
-                f"ansible_python_interpreter=/usr/bin/python3"
-            )
+        items = [(pattern, cfg) for pattern in host_patterns]
     else:
-        for name, cfg in ssh_configs.items():
-            lines.append(
-                f"{name} "
-                f"ansible_host={cfg['hostname']} "
-                f"ansible_port={cfg['port']} "
-                f"ansible_user={cfg['user']} "
-                f"ansible_ssh_private_key_file={cfg['identityfile']} "
-                f"ansible_ssh_common_args='-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null' "
-                f"ansible_python_interpreter=/usr/bin/python3"
-            )
-    return "\n".join(lines) + "\n"
+        items = list(ssh_configs.items())
+
+    body = "\n".join(
+        _INVENTORY_LINE.format(name=name, ssh_common_args=ssh_common_args, **cfg)
+        for name, cfg in items
+    )
+    return "[vagrant]\n" + body + "\n"
+
+
+def _write_if_changed(path: str, content: str) -> None:
+    try:
+        with open(path, "r") as f:
+            if f.read() == content:
+                return
+    except FileNotFoundError:
+        pass
+    with open(path, "w") as f:
+        f.write(content)
+
+
+@functools.lru_cache(maxsize=None)
+def _default_control_dir() -> str:
+    """
+    Short absolute directory for ControlMaster sockets, shared by every run in
+    the process. Artifact dirs are too long for socket paths and may be
+    relative to a cwd other than the one ansible-runner starts ssh in.
+    """
+    path = tempfile.mkdtemp(prefix="pav-")
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def _resolve_artifact_dir(
+    artifact_dir: str | None, artifact_dir_factory: Callable[[], str] | None
+) -> str:
+    if artifact_dir:
+        return artifact_dir
+    if artifact_dir_factory is not None:
+        return artifact_dir_factory()
+    return tempfile.mkdtemp(prefix="pytest-ansible-vagrant-")
 
 
 def run_playbook_on_vagrant_host(
@@ -51,6 +123,16 @@ def run_playbook_on_vagrant_host(
     extravars: dict[str, Any] | None,
     artifact_dir: str | None,
 ) -> None:
+    """
+    Deprecated: pass every host to `run_playbook_on_vagrant_hosts` so a single
+    ansible-runner invocation covers them all instead of one run per VM.
+    """
+    warnings.warn(
+        "run_playbook_on_vagrant_host is deprecated; "
+        "use run_playbook_on_vagrant_hosts with all ssh_configs instead",
+        DeprecationWarning,
+        stacklevel=2,
+    )
     run_playbook_on_vagrant_hosts(
         playbook=playbook,
         project_dir=project_dir,
@@ -69,45 +151,114 @@ def run_playbook_on_vagrant_hosts(
     inventory_file: str | None,
     extravars: dict[str, Any] | None,
     artifact_dir: str | None,
+    artifact_dir_factory: Callable[[], str] | None = None,
+    roles_path: str | None = None,
+    control_dir: str | None = None,
+    fact_cache_key: str | None = None,
 ) -> None:
-    artifact_dir_resolved = artifact_dir or tempfile.mkdtemp(
-        prefix="pytest-ansible-vagrant-"
+    """
+    fact_cache_key identifies the current VMs (e.g. a digest of their machine
+    ids). When given, facts are cached under it and reused by later runs for
+    up to two hours; without it every run gathers facts afresh. Passing a key
+    opts in to stale facts: a later playbook sees the facts gathered before
+    earlier playbooks changed the VM, so use `setup` explicitly where that
+    matters.
+    """
+    artifact_dir_resolved = _resolve_artifact_dir(artifact_dir, artifact_dir_factory)
+    os.makedirs(artifact_dir_resolved, exist_ok=True)
+    ssh_common_args = _SSH_COMMON_ARGS.format(
+        cm_dir=control_dir or _default_control_dir()
     )
+    # ansible-runner keeps its jsonfile fact cache per run ident; an absolute
+    # path shares it across runs so `smart` gathering can reuse facts.
+    facts_dir: str | None = None
+    if fact_cache_key:
+        facts_dir = os.path.join(artifact_dir_resolved, "facts", fact_cache_key)
+        os.makedirs(facts_dir, exist_ok=True)
 
     if inventory_file:
         inventory = inventory_file
         cfg = next(iter(ssh_configs.values()))
         ssh_vars = {
+            **_STATIC_SSH_VARS,
             "ansible_host": cfg["hostname"],
             "ansible_port": cfg["port"],
             "ansible_user": cfg["user"],
             "ansible_ssh_private_key_file": cfg["identityfile"],
-            "ansible_ssh_common_args": "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null",
-            "ansible_python_interpreter": "/usr/bin/python3",
+            "ansible_ssh_common_args": ssh_common_args,
         }
     else:
         host_patterns = extract_play_hosts(playbook) or None
-        inventory_content = _build_inventory_content(ssh_configs, host_patterns)
+        inventory_content = _build_inventory_content(
+            ssh_configs, host_patterns, ssh_common_args
+        )
         inventory_path = os.path.join(artifact_dir_resolved, "inventory.ini")
-        os.makedirs(artifact_dir_resolved, exist_ok=True)
-        with open(inventory_path, "w") as f:
-            f.write(inventory_content)
+        _write_if_changed(inventory_path, inventory_content)
         inventory = inventory_path
         ssh_vars = {}
 
-    base_extravars = (extravars or {}) | ssh_vars
+    # Connection vars from ssh-config take precedence over user extravars.
+    base_extravars = {**extravars, **ssh_vars} if extravars else ssh_vars
 
     rcfg = RunnerConfig(
         project_dir=project_dir,
         private_data_dir=project_dir,
-        roles_path=os.path.join(project_dir, "roles"),
+        roles_path=roles_path or os.path.join(project_dir, "roles"),
         playbook=playbook,
         inventory=inventory,
         artifact_dir=artifact_dir_resolved,
         extravars=base_extravars,
+        envvars=_tuned_envvars(len(ssh_configs), reuse_facts=facts_dir is not None),
+        fact_cache=facts_dir,
     )
     rcfg.prepare()
     status, rc = Runner(config=rcfg).run()
 
     if rc != 0 or status != "successful":
         raise RuntimeError(f"ansible-runner failed: status={status!r}, rc={rc}")
+
+
+def run_playbooks_on_vagrant_hosts_parallel(
+    *,
+    playbooks: list[str],
+    project_dir: str,
+    ssh_configs: dict[str, SSHConfig],
+    inventory_file: str | None,
+    extravars: dict[str, Any] | None,
+    artifact_dir: str | None,
+    artifact_dir_factory: Callable[[], str] | None = None,
+    roles_path: str | None = None,
+    max_workers: int | None = None,
+    control_dir: str | None = None,
+    fact_cache_key: str | None = None,
+) -> None:
+    """
+    Run independent playbooks concurrently, each in its own artifact subdir.
+    Failures are collected and raised together once every run has finished.
+    """
+    base_dir = _resolve_artifact_dir(artifact_dir, artifact_dir_factory)
+
+    def _run_one(index: int, playbook: str) -> None:
+        run_playbook_on_vagrant_hosts(
+            playbook=playbook,
+            project_dir=project_dir,
+            ssh_configs=ssh_configs,
+            inventory_file=inventory_file,
+            extravars=extravars,
+            artifact_dir=os.path.join(base_dir, str(index)),
+            roles_path=roles_path,
+            control_dir=control_dir,
+            fact_cache_key=fact_cache_key,
+        )
+
+    workers = max_workers or min(len(playbooks), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_one, i, pb) for i, pb in enumerate(playbooks)]
+
+    failures = [
+        f"{pb}: {fut.exception()}"
+        for pb, fut in zip(playbooks, futures)
+        if fut.exception() is not None
+    ]
+    if failures:
+        raise RuntimeError("ansible-runner failed for: " + "; ".join(failures))
@@ -1,30 +1,46 @@
 class VagrantError(Exception):
     """Base exception for vagrant errors."""
 
+    __slots__ = ()
 
-class VagrantfileNotFound(VagrantError):
+
+class VagrantfileNotFound(VagrantError, FileNotFoundError):
     """Vagrantfile not found."""
 
+    __slots__ = ()
+
 
 class VagrantCommandFailed(VagrantError):
     """Vagrant command execution failed."""
 
+    __slots__ = ()
+
 
 class PlaybookNotFound(VagrantError):
     """Ansible playbook file not found."""
 
+    __slots__ = ()
+
 
 class PlaybookFailed(VagrantError):
     """Ansible playbook execution failed."""
 
+    __slots__ = ()
+
 
 class InvalidProjectLayout(VagrantError):
     """Invalid ansible project layout (missing roles/ or tests/)."""
 
+    __slots__ = ()
+
 
 class SSHConfigError(VagrantError):
     """Error parsing vagrant ssh-config output."""
 
+    __slots__ = ()
+
 
 class HostNotFound(VagrantError):
     """Requested host not found in vagrant environment."""
+
+    __slots__ = ()
@@ -1,95 +1,164 @@
 from __future__ import annotations
 
-from typing import Generator
+import hashlib
+from typing import Any, Generator
 
 import pytest
 
 from pytest_ansible_vagrant.runner import ShutdownMode, VagrantRunner, destroy, halt
+from pytest_ansible_vagrant.utilities import read_setting
 
+_SHUTDOWN_MODES = {m.value: m for m in ShutdownMode}
 
-def pytest_addoption(parser: pytest.Parser) -> None:
-    parser.addini(
+
+def _resolve_shutdown_mode(config: pytest.Config) -> ShutdownMode:
+    raw = read_setting(config, "vagrant_shutdown").lower() or ShutdownMode.NONE.value
+    try:
+        return _SHUTDOWN_MODES[raw]
+    except KeyError:
+        raise pytest.UsageError(
+            f"Invalid vagrant_shutdown {raw!r}; expected one of: "
+            + ", ".join(_SHUTDOWN_MODES)
+        ) from None
+
+
+_SCOPES = ("module", "package", "session")
+
+
+def _fixture_scope(fixture_name: str, config: pytest.Config) -> str:
+    scope = read_setting(config, "vagrant_scope").lower() or "module"
+    if scope not in _SCOPES:
+        raise pytest.UsageError(
+            f"Invalid vagrant_scope {scope!r}; expected one of: " + ", ".join(_SCOPES)
+        )
+    return scope
+
+
+_INI_OPTS: tuple[tuple[str, str, str], ...] = (
+    (
         "vagrant_shutdown",
         "Vagrant shutdown behavior (halt|destroy|none).",
-        default=ShutdownMode.DESTROY.value,
-    )
-    parser.addini(
-        "vagrant_file",
-        "Path to the Vagrantfile.",
-        default="Vagrantfile",
-    )
-    parser.addini(
+        ShutdownMode.DESTROY.value,
+    ),
+    ("vagrant_file", "Path to the Vagrantfile.", "Vagrantfile"),
+    (
         "vagrant_project_dir",
         "Base project directory; if omitted it is inferred as the parent of the nearest `tests/` directory.",
-        default="",
-    )
-    parser.addini(
-        "vagrant_artifact_dir",
-        "Directory to store artifacts from ansible run.",
-        default="",
-    )
-    parser.addini(
+        "",
+    ),
+    ("vagrant_artifact_dir", "Directory to store artifacts from ansible run.", ""),
+    (
         "vagrant_provider",
         "Vagrant provider name (for example: virtualbox, libvirt).",
-        default="virtualbox",
-    )
+        "virtualbox",
+    ),
+    (
+        "vagrant_scope",
+        "Scope of the vagrant_runner fixture (module|package|session).",
+        "module",
+    ),
+    (
+        "vagrant_no_parallel",
+        "Bring machines up and down one at a time (true|false).",
+        "",
+    ),
+)
 
-    grp = parser.getgroup("vagrant")
-    grp.addoption(
-        "--vagrant-file",
-        action="store",
-        dest="vagrant_file",
-        help="Path to the Vagrantfile",
-    )
-    grp.addoption(
+_CLI_OPTS: tuple[tuple[str, dict[str, Any]], ...] = (
+    ("--vagrant-file", {"dest": "vagrant_file", "help": "Path to the Vagrantfile"}),
+    (
         "--vagrant-shutdown",
-        action="store",
-        dest="vagrant_shutdown",
-        choices=[m.value for m in ShutdownMode],
-        help="Shutdown behavior after tests: halt|destroy|none",
-    )
-    grp.addoption(
+        {
+            "dest": "vagrant_shutdown",
+            "choices": [m.value for m in ShutdownMode],
+            "help": "Shutdown behavior after tests: halt|destroy|none",
+        },
+    ),
+    (
         "--vagrant-project-dir",
-        action="store",
-        dest="vagrant_project_dir",
-        help="Base directory containing roles/ and tests/",
-    )
-    grp.addoption(
+        {
+            "dest": "vagrant_project_dir",
+            "help": "Base directory containing roles/ and tests/",
+        },
+    ),
+    (
         "--vagrant-artifact-dir",
-        action="store",
-        dest="vagrant_artifact_dir",
-        help="Directory to store artifacts from ansible run.",
-    )
-    grp.addoption(
+        {
+            "dest": "vagrant_artifact_dir",
+            "help": "Directory to store artifacts from ansible run.",
+        },
+    ),
+    (
         "--vagrant-provider",
-        action="store",
-        dest="vagrant_provider",
-        help="Vagrant provider name (for example: libvirt, virtualbox).",
-    )
+        {
+            "dest": "vagrant_provider",
+            "help": "Vagrant provider name (for example: libvirt, virtualbox).",
+        },
+    ),
+    (
+        "--vagrant-scope",
+        {
+            "dest": "vagrant_scope",
+            "choices": list(_SCOPES),
+            "help": "Share VMs per module (default), package or whole session.",
+        },
+    ),
+    (
+        "--vagrant-no-parallel",
+        {
+            "dest": "vagrant_no_parallel",
+            "action": "store_true",
+            "default": None,
+            "help": "Disable vagrant --parallel for provisioners that race.",
+        },
+    ),
+)
 
 
-@pytest.fixture(scope="module")
+def pytest_addoption(parser: pytest.Parser) -> None:
+    for name, help_, default in _INI_OPTS:
+        parser.addini(name, help_, default=default)
+
+    grp = parser.getgroup("vagrant")
+    for flag, kwargs in _CLI_OPTS:
+        grp.addoption(flag, **kwargs)
+
+
+def _session_artifact_dir(
+    tmp_path_factory: pytest.TempPathFactory, project_dir: str
+) -> str:
+    """
+    Stable per-project artifact dir under the session basetemp so repeated runs
+    reuse the fact cache.
+    """
+    digest = hashlib.blake2b(project_dir.encode(), digest_size=8).hexdigest()
+    path = tmp_path_factory.getbasetemp() / "pav" / digest
+    path.mkdir(parents=True, exist_ok=True)
+    return str(path)
+
+
+@pytest.fixture(scope=_fixture_scope)
 def vagrant_runner(
     request: pytest.FixtureRequest,
+    tmp_path_factory: pytest.TempPathFactory,
 ) -> Generator[VagrantRunner, None, None]:
-    runner = VagrantRunner(request)
+    # Resolved up front so a bad vagrant_shutdown fails before any VM boots.
+    mode = _resolve_shutdown_mode(request.config)
+    runner = VagrantRunner(
+        request,
+        artifact_dir_factory=lambda project_dir: _session_artifact_dir(
+            tmp_path_factory, project_dir
+        ),
+    )
     try:
         yield runner
     finally:
-        vf_abs = runner.vagrantfile
-        if not vf_abs:
-            return
-
-        raw_mode = (
-            request.config.getoption("vagrant_shutdown", default=None)
-            or request.config.getini("vagrant_shutdown")
-            or ShutdownMode.NONE.value
-        )
-        mode = ShutdownMode(raw_mode)
-
-        if mode is ShutdownMode.HALT:
-            halt(vf_abs)
-        elif mode is ShutdownMode.DESTROY:
-            destroy(vf_abs)
-        elif mode is ShutdownMode.NONE:
-            pass
+        # A shared runner may have brought up several Vagrantfiles.
+        for vf_abs, machines in runner.vagrantfiles.items():
+            if mode is ShutdownMode.HALT:
+                halt(vf_abs, machines, parallel=runner.parallel)
+            elif mode is ShutdownMode.DESTROY:
+                destroy(vf_abs, parallel=runner.parallel)
+            elif mode is ShutdownMode.NONE:
+                pass
+        runner.close()
@@ -1,24 +1,40 @@
 from __future__ import annotations
 
+import functools
+import glob
+import hashlib
 import os
-import re
+import shutil
+import stat
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import Any, TypedDict, cast
+from typing import TYPE_CHECKING, Any, Callable, Iterable, cast
 
 import pytest
-from testinfra import get_host
-from testinfra.host import Host
 
+from pytest_ansible_vagrant.exceptions import VagrantfileNotFound
 from pytest_ansible_vagrant.stubs import HostProtocol
 
 from pytest_ansible_vagrant.utilities import (
+    SSHConfig,
+    _from_ssh_config,
+    _from_ssh_config_multi,
+    _parse_ssh_config_block,
+    _which_cached,
+    extract_play_hosts,
     infer_project_dir_from_request,
+    is_project_layout,
+    read_setting,
     require_bins,
     resolve_inventory_path,
     resolve_playbook_path,
 )
 
+if TYPE_CHECKING:
+    from testinfra.host import Host
+
 
 class ShutdownMode(str, Enum):
     HALT = "halt"
@@ -26,149 +42,261 @@ class ShutdownMode(str, Enum):
     NONE = "none"
 
 
-_PAT_HOST = re.compile(r"^\s*Host\s+(\S+)\s*$", re.IGNORECASE)
-_PAT_KV = re.compile(
-    r"^\s*(HostName|User|Port|IdentityFile)\s+(.+?)\s*$", re.IGNORECASE
-)
-
-
-class SSHConfig(TypedDict):
-    hostname: str
-    port: int
-    user: str
-    identityfile: str
-
+# Defaults for provisioners run by vagrant; the caller's environment wins.
+_PROVISION_ENV = {
+    "PYTHONUNBUFFERED": "1",
+    "DEBIAN_FRONTEND": "noninteractive",
+}
 
-def _parse_ssh_config_block(fields: dict[str, str]) -> SSHConfig:
-    missing = [
-        k for k in ("hostname", "user", "port", "identityfile") if k not in fields
-    ]
-    if missing:
-        casing = {
-            "hostname": "HostName",
-            "user": "User",
-            "port": "Port",
-            "identityfile": "IdentityFile",
-        }
-        raise ValueError("ssh-config missing: " + ", ".join(casing[k] for k in missing))
 
-    try:
-        port = int(fields["port"])
-    except ValueError as e:
-        raise ValueError(f"ssh-config invalid Port: {fields['port']!r}") from e
-
-    return SSHConfig(
-        hostname=fields["hostname"],
-        port=port,
-        user=fields["user"],
-        identityfile=fields["identityfile"],
+@functools.lru_cache(maxsize=32)
+def _vagrant_env_overlay(abs_vf: str) -> tuple[tuple[str, str], ...]:
+    return (
+        ("VAGRANT_CWD", os.path.dirname(abs_vf)),
+        ("VAGRANT_VAGRANTFILE", os.path.basename(abs_vf)),
     )
 
 
-def _from_ssh_config(text: str) -> SSHConfig:
-    hosts = _from_ssh_config_multi(text)
-    if not hosts:
-        raise ValueError("ssh-config contains no valid host blocks")
-    return next(iter(hosts.values()))
-
-
-def _from_ssh_config_multi(text: str) -> dict[str, SSHConfig]:
-    hosts: dict[str, SSHConfig] = {}
-    current_host: str | None = None
-    fields: dict[str, str] = {}
-
-    for raw in text.splitlines():
-        host_match = _PAT_HOST.match(raw)
-        if host_match:
-            if current_host is not None and fields:
-                try:
-                    hosts[current_host] = _parse_ssh_config_block(fields)
-                except ValueError:
-                    pass
-            current_host = host_match.group(1)
-            fields = {}
-            continue
-
-        if current_host is None:
-            continue
-
-        m = _PAT_KV.match(raw)
-        if not m:
-            continue
-        key = m.group(1).lower()
-        val = m.group(2).strip()
-        if len(val) >= 2 and val[0] == val[-1] and val[0] in "\"'":
-            val = val[1:-1]
-        fields[key] = val
-
-    if current_host is not None and fields:
-        try:
-            hosts[current_host] = _parse_ssh_config_block(fields)
-        except ValueError:
-            pass
-
-    return hosts
-
-
 def _env_for_file(vagrantfile: str) -> dict[str, str]:
-    abs_vf = os.path.abspath(vagrantfile)
-    env = dict(os.environ)
-    env["VAGRANT_CWD"] = os.path.dirname(abs_vf)
-    env["VAGRANT_VAGRANTFILE"] = os.path.basename(abs_vf)
+    # os.environ is merged per call because pytest's monkeypatch and users
+    # may change it mid-session; only the Vagrantfile overlay is cached.
+    env = {**_PROVISION_ENV, **os.environ}
+    env.update(_vagrant_env_overlay(os.path.abspath(vagrantfile)))
     return env
 
 
 def _run(
-    cmd: list[str], vagrantfile: str, check: bool = True
-) -> subprocess.CompletedProcess[str]:
+    cmd: list[str], vagrantfile: str, check: bool = True, capture: bool = True
+) -> subprocess.CompletedProcess[bytes]:
+    """
+    Run a vagrant subcommand. Captured output is returned as bytes for the
+    caller to decode once. With capture=False the child writes straight to
+    our stdout/stderr (pytest's fd capture still collects it), so long
+    provisioner logs are never buffered in Python.
+    """
     return subprocess.run(
         ["vagrant", *cmd],
         env=_env_for_file(vagrantfile),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
+        capture_output=capture,
         check=check,
     )
 
 
-def up(vagrantfile: str, provider: str | None = "virtualbox") -> int:
-    if provider == "libvirt":
-        require_bins("vagrant", "ansible-playbook", "virsh", "qemu-system-x86_64")
-        args = ["up", "--provider", "libvirt"]
-    elif provider:
-        require_bins("vagrant", "ansible-playbook")
-        args = ["up", "--provider", provider]
+_TRUTHY = frozenset({"1", "true", "yes", "on"})
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in _TRUTHY
+
+
+def _parallel_enabled(parallel: bool) -> bool:
+    return parallel and not _env_flag("VAGRANT_NO_PARALLEL")
+
+
+_BASE_BINS = ("vagrant", "ansible-playbook")
+_PROVIDER_BINS: dict[str | None, tuple[str, ...]] = {
+    "libvirt": (*_BASE_BINS, "virsh", "qemu-system-x86_64"),
+}
+
+
+def _run_each(cmds: list[list[str]], vagrantfile: str, check: bool = True) -> int:
+    """
+    Run one vagrant process per command concurrently, streaming output.
+    Returns the first non-zero exit code, else 0.
+    """
+    with ThreadPoolExecutor(max_workers=len(cmds)) as pool:
+        codes = list(
+            pool.map(lambda c: _run(c, vagrantfile, check, False).returncode, cmds)
+        )
+    return next((rc for rc in codes if rc), 0)
+
+
+def _machine_names(vagrantfile: str) -> list[str]:
+    # Machine-readable lines are "timestamp,target,type,data..."
+    cp = _run(["status", "--machine-readable"], vagrantfile)
+    names: dict[str, None] = {}
+    for line in cp.stdout.decode("utf-8", "replace").splitlines():
+        parts = line.split(",", 3)
+        if len(parts) == 4 and parts[1] and parts[2] == "state":
+            names[parts[1]] = None
+    return list(names)
+
+
+def up(
+    vagrantfile: str, provider: str | None = "virtualbox", parallel: bool = True
+) -> int:
+    require_bins(*_PROVIDER_BINS.get(provider, _BASE_BINS))
+    args = ["up", "--provider", provider] if provider else ["up"]
+    if _parallel_enabled(parallel):
+        # Providers without native parallelism (e.g. virtualbox) ignore
+        # --parallel; PAV_PARALLEL_UP boots each machine in its own process.
+        if _env_flag("PAV_PARALLEL_UP"):
+            names = _machine_names(vagrantfile)
+            if len(names) > 1:
+                return _run_each([[*args, name] for name in names], vagrantfile)
+        args.append("--parallel")
     else:
-        require_bins("vagrant", "ansible-playbook")
-        args = ["up"]
-    return _run(args, vagrantfile).returncode
+        # `vagrant up` already runs in parallel on providers that support it.
+        args.append("--no-parallel")
+    return _run(args, vagrantfile, capture=False).returncode
 
 
-def halt(vagrantfile: str) -> int:
-    return _run(["halt"], vagrantfile, check=False).returncode
+# Vagrantfiles brought up by this process and not halted/destroyed since.
+_STARTED: set[str] = set()
 
 
-def destroy(vagrantfile: str, force: bool = True) -> int:
+def _ensure_up(vagrantfile: str, provider: str | None, parallel: bool) -> None:
+    """
+    `vagrant up` on running machines still pays the vagrant start-up, so skip
+    it for Vagrantfiles this process has already brought up.
+    """
+    vf_abs = os.path.abspath(vagrantfile)
+    if vf_abs not in _STARTED:
+        up(vf_abs, provider=provider, parallel=parallel)
+        _STARTED.add(vf_abs)
+
+
+def halt(
+    vagrantfile: str, machines: Iterable[str] | None = None, parallel: bool = True
+) -> int:
+    """
+    `vagrant halt` has no --parallel flag, so when several machines are known
+    and parallelism is allowed, halt each one in its own vagrant process.
+    Returns the first non-zero exit code, else 0.
+    """
+    _forget_ssh_configs(vagrantfile)
+    names = list(machines or ())
+    if len(names) < 2 or not _parallel_enabled(parallel):
+        return _run(["halt"], vagrantfile, check=False, capture=False).returncode
+    return _run_each([["halt", name] for name in names], vagrantfile, check=False)
+
+
+def destroy(vagrantfile: str, force: bool = True, parallel: bool = True) -> int:
+    _forget_ssh_configs(vagrantfile)
     args = ["destroy", "-f"] if force else ["destroy"]
-    return _run(args, vagrantfile, check=False).returncode
+    # vagrant only accepts --parallel for destroy together with --force
+    if force and _parallel_enabled(parallel):
+        args.append("--parallel")
+    return _run(args, vagrantfile, check=False, capture=False).returncode
+
+
+# abspath(Vagrantfile) -> (state stamp, parsed ssh-config for every machine)
+_SSH_CONFIG_CACHE: dict[str, tuple[tuple[int, ...], dict[str, SSHConfig]]] = {}
+
+
+def _forget_ssh_configs(vagrantfile: str) -> None:
+    vf_abs = os.path.abspath(vagrantfile)
+    _SSH_CONFIG_CACHE.pop(vf_abs, None)
+    _STARTED.discard(vf_abs)
+
+
+def _machine_id_files(vf_abs: str) -> list[str]:
+    return sorted(
+        glob.glob(
+            os.path.join(
+                os.path.dirname(vf_abs), ".vagrant", "machines", "*", "*", "id"
+            )
+        )
+    )
+
+
+def _state_stamp(vf_abs: str) -> tuple[int, ...]:
+    """
+    mtimes of the Vagrantfile and of every `.vagrant/machines/*/*/id` file, so
+    machines recreated outside this process invalidate the cached ssh-config.
+    """
+    stamp = [os.stat(vf_abs).st_mtime_ns]
+    for path in _machine_id_files(vf_abs):
+        try:
+            stamp.append(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            pass
+    return tuple(stamp)
+
+
+def _fact_cache_key(vf_abs: str) -> str:
+    """
+    Digest of the Vagrantfile path and its current machine ids. A recreated VM
+    gets a new id, so cached facts never outlive the machine they came from
+    or leak to a same-named host of another Vagrantfile.
+    """
+    digest = hashlib.blake2b(vf_abs.encode(), digest_size=8)
+    for path in _machine_id_files(vf_abs):
+        try:
+            with open(path, "rb") as fh:
+                digest.update(path.encode() + b"\0" + fh.read())
+        except FileNotFoundError:
+            pass
+    return digest.hexdigest()
+
+
+def _load_ssh_configs(vagrantfile: str) -> dict[str, SSHConfig]:
+    """
+    Parsed `vagrant ssh-config` for every machine, cached per Vagrantfile and
+    its state stamp so repeat lookups skip the vagrant start-up. halt/destroy
+    drop only the entry for their own Vagrantfile.
+    """
+    vf_abs = os.path.abspath(vagrantfile)
+    stamp = _state_stamp(vf_abs)
+    cached = _SSH_CONFIG_CACHE.get(vf_abs)
+    if cached is None or cached[0] != stamp:
+        cp = _run(["ssh-config"], vf_abs)
+        cached = _SSH_CONFIG_CACHE[vf_abs] = (
+            stamp,
+            _from_ssh_config_multi(cp.stdout.decode("utf-8", "replace")),
+        )
+    return {name: SSHConfig(**cfg) for name, cfg in cached[1].items()}
 
 
 def ssh_config(vagrantfile: str, host: str | None = None) -> SSHConfig:
-    cp = _run(["ssh-config"], vagrantfile)
+    hosts = _load_ssh_configs(vagrantfile)
     if host:
-        hosts = _from_ssh_config_multi(cp.stdout)
         if host not in hosts:
             available = list(hosts.keys())
             raise ValueError(
                 f"Host {host!r} not found in ssh-config. Available: {available}"
             )
         return hosts[host]
-    return _from_ssh_config(cp.stdout)
+    if not hosts:
+        raise ValueError("ssh-config contains no valid host blocks")
+    return next(iter(hosts.values()))
 
 
 def ssh_config_all(vagrantfile: str) -> dict[str, SSHConfig]:
-    cp = _run(["ssh-config"], vagrantfile)
-    return _from_ssh_config_multi(cp.stdout)
+    return _load_ssh_configs(vagrantfile)
+
+
+def _exit_control_masters(cm_dir: str) -> None:
+    if _which_cached("ssh") is None:
+        return
+    try:
+        with os.scandir(cm_dir) as it:
+            sockets = [e.path for e in it if stat.S_ISSOCK(e.stat().st_mode)]
+    except FileNotFoundError:
+        return
+    for path in sockets:
+        # The host argument is ignored: ControlPath names the master directly.
+        subprocess.run(
+            ["ssh", "-o", f"ControlPath={path}", "-O", "exit", "pav"],
+            capture_output=True,
+            check=False,
+        )
+
+
+def _build_host(cfg: SSHConfig, cm_dir: str) -> Host:
+    # testinfra backends connect lazily on the first command, so building
+    # hosts is cheap and needs no thread pool. The ControlPath is keyed by
+    # endpoint so two live VMs never share a master connection. testinfra
+    # (and paramiko behind it) is imported here, not at plugin load.
+    from testinfra import get_host
+
+    return get_host(
+        f"ssh://{cfg['user']}@{cfg['hostname']}:{cfg['port']}",
+        ssh_identity_file=cfg["identityfile"],
+        ssh_extra_args="-o StrictHostKeyChecking=accept-new -o UserKnownHostsFile=/dev/null",
+        controlpath=os.path.join(cm_dir, f"{cfg['hostname']}-{cfg['port']}"),
+        controlpersist=600,
+    )
 
 
 class VagrantRunner:
@@ -182,43 +310,38 @@ class VagrantRunner:
             ...
     """
 
-    def __init__(self, request: pytest.FixtureRequest) -> None:
+    def __init__(
+        self,
+        request: pytest.FixtureRequest,
+        artifact_dir_factory: Callable[[str], str] | None = None,
+    ) -> None:
         config = request.config
 
-        proj_cli = config.getoption("vagrant_project_dir", default=None)
-        proj_ini = (config.getini("vagrant_project_dir") or "").strip()
-        if proj_cli:
-            default_project_dir = os.path.abspath(proj_cli)
-        elif proj_ini:
-            default_project_dir = os.path.abspath(proj_ini)
+        proj = read_setting(config, "vagrant_project_dir")
+        if proj:
+            default_project_dir = os.path.abspath(proj)
         else:
             default_project_dir = infer_project_dir_from_request(request)
 
-        assert (
-            os.path.isdir(default_project_dir)
-            and os.path.isdir(os.path.join(default_project_dir, "tests"))
-            and os.path.isdir(os.path.join(default_project_dir, "roles"))
-        ), (
+        assert is_project_layout(default_project_dir), (
             f"Invalid ansible project layout. Expected sibling 'tests' and 'roles' "
             f"under project_dir; resolved project_dir={default_project_dir!r}"
         )
 
-        artifact_dir_cli = config.getoption("vagrant_artifact_dir", default=None)
-        artifact_dir_ini = config.getini("vagrant_artifact_dir") or None
-
-        provider_cli = config.getoption("vagrant_provider", default=None)
-        provider_ini = (config.getini("vagrant_provider") or "").strip()
-        provider = provider_cli or provider_ini or "virtualbox"
-
-        self._config = config
         self._default_project_dir = default_project_dir
-        self._artifact_dir_cli = artifact_dir_cli
-        self._artifact_dir_ini = artifact_dir_ini
-        self._provider = provider
+        self._default_roles_dir = os.path.join(default_project_dir, "roles")
+        self._artifact_dir = read_setting(config, "vagrant_artifact_dir") or None
+        self._provider = read_setting(config, "vagrant_provider") or "virtualbox"
+        self._vagrant_file = read_setting(config, "vagrant_file") or "Vagrantfile"
+        no_parallel = read_setting(config, "vagrant_no_parallel").lower()
+        self._parallel = no_parallel not in _TRUTHY
+        self._artifact_dir_factory = artifact_dir_factory
         self._vagrantfile: str | None = None
         self._host: Host | None = None
         self._hosts: dict[str, Host] = {}
         self._ssh_configs: dict[str, SSHConfig] = {}
+        self._machines: dict[str, tuple[str, ...]] = {}
+        self._cm_dir: str | None = None
 
     def __call__(
         self,
@@ -233,11 +356,12 @@ class VagrantRunner:
     ) -> HostProtocol:
         from pytest_ansible_vagrant.ansible import run_playbook_on_vagrant_hosts
 
-        proj = (
-            os.path.abspath(project_dir)
-            if project_dir is not None
-            else self._default_project_dir
-        )
+        if project_dir is not None:
+            proj = os.path.abspath(project_dir)
+            roles_dir = os.path.join(proj, "roles")
+        else:
+            proj = self._default_project_dir
+            roles_dir = self._default_roles_dir
         resolved_playbook = resolve_playbook_path(proj, playbook)
         resolved_inventory = resolve_inventory_path(proj, inventory_file)
 
@@ -248,26 +372,26 @@ class VagrantRunner:
                 else os.path.join(proj, vagrant_file)
             )
         else:
-            config = self._config
-            vf = (
-                config.getoption("vagrant_file", default=None)
-                or (config.getini("vagrant_file") or "").strip()
-                or "Vagrantfile"
-            )
+            vf = self._vagrant_file
             vf_abs = vf if os.path.isabs(vf) else os.path.join(proj, vf)
 
         if not os.path.exists(vf_abs):
-            raise FileNotFoundError(f"Vagrantfile not found at: {vf_abs!r}")
+            raise VagrantfileNotFound(f"Vagrantfile not found at: {vf_abs!r}")
 
         self._vagrantfile = vf_abs
         provider_to_use = self._provider if provider is None else provider
 
-        self._hosts = {}
-        self._ssh_configs = {}
+        self.reset()
+        self._machines.setdefault(vf_abs, ())
 
-        up(vf_abs, provider=provider_to_use)
+        if resolved_inventory is None:
+            # Parse the playbook before the long VM boot: a malformed file
+            # fails fast, and the inventory step then hits the warm cache.
+            extract_play_hosts(resolved_playbook)
+        _ensure_up(vf_abs, provider_to_use, self._parallel)
         all_ssh_configs = ssh_config_all(vf_abs)
         self._ssh_configs = all_ssh_configs
+        self._machines[vf_abs] = tuple(all_ssh_configs)
 
         if target_host:
             if target_host not in all_ssh_configs:
@@ -285,18 +409,21 @@ class VagrantRunner:
             ssh_configs=ssh_configs_to_use,
             inventory_file=resolved_inventory,
             extravars=extravars,
-            artifact_dir=self._artifact_dir_cli
-            or self._artifact_dir_ini
-            or artifact_dir,
+            artifact_dir=self._artifact_dir or artifact_dir,
+            artifact_dir_factory=(
+                functools.partial(self._artifact_dir_factory, proj)
+                if self._artifact_dir_factory is not None
+                else None
+            ),
+            roles_path=roles_dir,
+            control_dir=self._control_dir(),
+            fact_cache_key=_fact_cache_key(vf_abs),
         )
 
-        for name, cfg in ssh_configs_to_use.items():
-            host = get_host(
-                f"ssh://{cfg['user']}@{cfg['hostname']}:{cfg['port']}",
-                ssh_identity_file=cfg["identityfile"],
-                ssh_extra_args="-o StrictHostKeyChecking=accept-new -o UserKnownHostsFile=/dev/null",
-            )
-            self._hosts[name] = host
+        self._hosts = {
+            name: _build_host(cfg, self._control_dir())
+            for name, cfg in ssh_configs_to_use.items()
+        }
 
         if target_host:
             self._host = self._hosts[target_host]
@@ -305,6 +432,31 @@ class VagrantRunner:
 
         return cast(HostProtocol, self._host)
 
+    def reset(self) -> None:
+        """
+        Forget the hosts from the previous invocation. VMs and the list of
+        used Vagrantfiles are kept, so a shared runner only re-runs playbooks.
+        """
+        self._host = None
+        self._hosts = {}
+        self._ssh_configs = {}
+
+    def _control_dir(self) -> str:
+        if self._cm_dir is None:
+            self._cm_dir = tempfile.mkdtemp(prefix="pav-cm-")
+        return self._cm_dir
+
+    def close(self) -> None:
+        """
+        Stop the SSH control masters used by ansible and testinfra, then remove
+        their socket directory. Masters would otherwise linger for the whole
+        ControlPersist window after the VMs are halted, destroyed or kept.
+        """
+        if self._cm_dir is not None:
+            _exit_control_masters(self._cm_dir)
+            shutil.rmtree(self._cm_dir, ignore_errors=True)
+            self._cm_dir = None
+
     @property
     def host(self) -> HostProtocol:
         if self._host is None:
@@ -331,6 +483,15 @@ class VagrantRunner:
             raise RuntimeError("VagrantRunner has not been invoked yet")
         return self._ssh_configs
 
+    @property
+    def parallel(self) -> bool:
+        return self._parallel
+
     @property
     def vagrantfile(self) -> str | None:
         return self._vagrantfile
+
+    @property
+    def vagrantfiles(self) -> dict[str, tuple[str, ...]]:
+        """Every Vagrantfile this runner has used, with its machine names."""
+        return dict(self._machines)
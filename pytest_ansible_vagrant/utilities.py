@@ -1,40 +1,199 @@
 from __future__ import annotations
 
+import functools
 import os
 import shutil
-from typing import Any
+import weakref
+from pathlib import Path
+from typing import Any, Iterator, TypedDict
 
 import pytest
-import yaml
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+
+# Lowercased ssh-config keywords the parser reads; vagrant emits many more.
+_SSH_KEYS = frozenset({"host", "hostname", "user", "port", "identityfile"})
+_QUOTES = frozenset("\"'")
+
+
+class SSHConfig(TypedDict):
+    hostname: str
+    port: int
+    user: str
+    identityfile: str
+
+
+def _parse_ssh_config_block(fields: dict[str, str]) -> SSHConfig:
+    missing = [
+        k for k in ("hostname", "user", "port", "identityfile") if k not in fields
+    ]
+    if missing:
+        casing = {
+            "hostname": "HostName",
+            "user": "User",
+            "port": "Port",
+            "identityfile": "IdentityFile",
+        }
+        raise ValueError("ssh-config missing: " + ", ".join(casing[k] for k in missing))
+
+    try:
+        port = int(fields["port"])
+    except ValueError as e:
+        raise ValueError(f"ssh-config invalid Port: {fields['port']!r}") from e
+
+    return SSHConfig(
+        hostname=fields["hostname"],
+        port=port,
+        user=fields["user"],
+        identityfile=fields["identityfile"],
+    )
+
+
+def _close_ssh_config_block(
+    host: str | None, fields: dict[str, str]
+) -> tuple[str, SSHConfig] | None:
+    if host is None or not fields:
+        return None
+    try:
+        return host, _parse_ssh_config_block(fields)
+    except ValueError:
+        return None
+
+
+def _iter_ssh_config_blocks(text: str) -> Iterator[tuple[str, SSHConfig]]:
+    """
+    Lazily yield (host, config) for each valid Host block as soon as it
+    closes; blocks missing required fields are skipped.
+    """
+    current_host: str | None = None
+    fields: dict[str, str] = {}
+
+    for raw in text.splitlines():
+        parts = raw.split(None, 1)
+        if len(parts) != 2:
+            continue
+        key = parts[0].lower()
+        if key not in _SSH_KEYS:
+            continue
+        val = parts[1].rstrip()
+        if key == "host":
+            block = _close_ssh_config_block(current_host, fields)
+            if block is not None:
+                yield block
+            current_host = val
+            fields = {}
+            continue
+
+        # ssh uses the first value given for a keyword, so later ones are skipped.
+        if current_host is None or key in fields:
+            continue
+
+        if len(val) >= 2 and val[0] in _QUOTES and val[-1] == val[0]:
+            val = val[1:-1]
+        fields[key] = val
+
+    block = _close_ssh_config_block(current_host, fields)
+    if block is not None:
+        yield block
+
+
+def _from_ssh_config(text: str) -> SSHConfig:
+    for _, cfg in _iter_ssh_config_blocks(text):
+        return cfg
+    raise ValueError("ssh-config contains no valid host blocks")
+
+
+def _from_ssh_config_multi(text: str) -> dict[str, SSHConfig]:
+    return dict(_iter_ssh_config_blocks(text))
+
+
+@functools.lru_cache(maxsize=None)
+def _which_cached(name: str) -> str | None:
+    return shutil.which(name)
 
 
 def require_bins(*bins: str) -> None:
-    missing = [b for b in bins if shutil.which(b) is None]
+    missing = [b for b in bins if _which_cached(b) is None]
     if missing:
         raise RuntimeError("Missing required binaries: " + ", ".join(missing))
 
 
+_SETTINGS: weakref.WeakKeyDictionary[pytest.Config, dict[str, str]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def read_setting(config: pytest.Config, name: str) -> str:
+    """
+    Resolve a plugin setting: CLI option first, then the ini value, else "".
+    Cached per config since neither source changes during a session.
+    """
+    cache = _SETTINGS.setdefault(config, {})
+    if name not in cache:
+        value = config.getoption(name, default=None) or config.getini(name) or ""
+        cache[name] = str(value).strip()
+    return cache[name]
+
+
 def infer_project_dir_from_request(request: pytest.FixtureRequest) -> str:
     """
     Walk up from the test file until 'tests/' is found, then return its parent.
-    Fallback: parent-of-parent of the test file.
+    Fallback: parent-of-parent of the test file. Session-scoped requests have
+    no test file, so the walk starts at the pytest rootdir, which is itself
+    the project dir when it has no `tests/` ancestor.
+    """
+    try:
+        path = request.path
+    except AttributeError:
+        rootdir = Path(os.path.abspath(request.config.rootpath))
+        for parent in (rootdir, *rootdir.parents):
+            if parent.name == "tests":
+                return str(parent.parent)
+        return str(rootdir)
+    return _infer_project_dir(os.path.abspath(str(path)))
+
+
+@functools.lru_cache(maxsize=256)
+def _infer_project_dir(test_path: str) -> str:
+    # Pure path arithmetic, so safe to share across every module in a session.
+    parents = Path(test_path).parents
+    for parent in parents:
+        if parent.name == "tests":
+            return str(parent.parent)
+    return str(parents[1] if len(parents) > 1 else parents[0])
+
+
+_LAYOUT_DIRS = frozenset({"tests", "roles"})
+
+
+def is_project_layout(project_dir: str) -> bool:
+    """
+    True if project_dir contains both `tests/` and `roles/` directories.
+    Uses a single directory scan; symlinked directories are accepted.
     """
-    test_file = os.path.abspath(str(request.path))
-    cur = os.path.dirname(test_file)
-    while True:
-        if os.path.basename(cur) == "tests":
-            return os.path.dirname(cur)
-        parent = os.path.dirname(cur)
-        if parent == cur:
-            return os.path.dirname(os.path.dirname(test_file))
-        cur = parent
+    try:
+        with os.scandir(project_dir) as it:
+            dirs = {e.name for e in it if e.name in _LAYOUT_DIRS and e.is_dir()}
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+    return dirs == _LAYOUT_DIRS
 
 
-def resolve_playbook_path(project_dir: str, playbook: str) -> str:
+@functools.lru_cache(maxsize=256)
+def resolve_playbook_path(
+    project_dir: str | os.PathLike[str], playbook: str | os.PathLike[str]
+) -> str:
     """
     If playbook is absolute and exists -> return it.
     Else treat as relative to project_dir.
+    Accepts str or os.PathLike; always returns a str.
+    Successful resolutions are cached; paths are stable within a run.
     """
+    project_dir, playbook = os.fspath(project_dir), os.fspath(playbook)
     if os.path.isabs(playbook):
         if os.path.exists(playbook):
             return playbook
@@ -48,14 +207,19 @@ def resolve_playbook_path(project_dir: str, playbook: str) -> str:
     )
 
 
-def resolve_inventory_path(project_dir: str, inventory_file: str | None) -> str | None:
+@functools.lru_cache(maxsize=256)
+def resolve_inventory_path(
+    project_dir: str | os.PathLike[str], inventory_file: str | os.PathLike[str] | None
+) -> str | None:
     """
     If a path is provided and exists (absolute or relative to project_dir), return the path.
     If provided but not found as a file, pass through unchanged (it may be a host-list string).
     If not provided, return None.
+    Results are cached; paths are stable within a run.
     """
     if not inventory_file:
         return None
+    project_dir, inventory_file = os.fspath(project_dir), os.fspath(inventory_file)
     if os.path.isabs(inventory_file):
         return inventory_file
     candidate = os.path.join(project_dir, inventory_file)
@@ -64,27 +228,141 @@ def resolve_inventory_path(project_dir: str, inventory_file: str | None) -> str
 
 def extract_play_hosts(playbook_path: str) -> list[str]:
     """
-    Minimal YAML parser to extract unique `hosts` patterns from a playbook.
-    Returns an ordered list of unique patterns. Empty if none.
+    Extract the unique `hosts` patterns from a playbook, in play order.
+    JSON playbooks go through orjson when installed; YAML is read as libyaml
+    parser events, falling back to the full safe loader for aliases, merge
+    keys and multi-document streams. Empty if no play names its hosts.
+    Parsed results are cached until the file's mtime or size changes.
     """
-    with open(playbook_path, "r", encoding="utf-8") as fh:
-        data = yaml.safe_load(fh)
+    path = os.path.abspath(playbook_path)
+    st = os.stat(path)
+    return list(_extract_play_hosts_cached(path, st.st_mtime_ns, st.st_size))
 
-    plays: list[dict[str, Any]]
+
+@functools.lru_cache(maxsize=256)
+def _extract_play_hosts_cached(
+    playbook_path: str, mtime_ns: int, size: int
+) -> tuple[str, ...]:
+    # Bytes go straight to orjson and libyaml, which decode UTF-8 themselves.
+    with open(playbook_path, "rb") as fh:
+        raw = fh.read()
+
+    hosts: list[str] | None = None
+    if orjson is not None and raw.lstrip()[:1] in (b"[", b"{"):
+        try:
+            hosts = _hosts_from_plays(orjson.loads(raw))
+        except orjson.JSONDecodeError:
+            pass
+    if hosts is None:
+        hosts = _scan_play_hosts(raw)
+    return tuple(dict.fromkeys(h.strip() for h in hosts if h.strip()))
+
+
+def _hosts_from_plays(data: Any) -> list[str]:
+    plays: list[Any]
     if isinstance(data, list):
-        plays = [p for p in data if isinstance(p, dict)]
+        plays = data
     elif isinstance(data, dict):
         plays = [data]
     else:
         return []
+    return [
+        p["hosts"]
+        for p in plays
+        if isinstance(p, dict) and isinstance(p.get("hosts"), str)
+    ]
 
-    seen: set[str] = set()
-    out: list[str] = []
-    for p in plays:
-        h = p.get("hosts")
-        if isinstance(h, str):
-            hv = h.strip()
-            if hv and hv not in seen:
-                seen.add(hv)
-                out.append(hv)
-    return out
+
+_STR_TAG = "tag:yaml.org,2002:str"
+
+
+@functools.lru_cache(maxsize=None)
+def _yaml_backend() -> tuple[Any, Any, Any]:
+    """
+    Import PyYAML on the first parse rather than when pytest loads the plugin.
+    Returns (yaml module, libyaml loader if available else SafeLoader, resolver).
+    """
+    import yaml
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml, loader, yaml.resolver.Resolver()
+
+
+def _scan_play_hosts(stream: Any) -> list[str]:
+    """
+    Walk parser events and collect the string `hosts` value of each play,
+    without composing or constructing the rest of the document.
+    A play is the root mapping or a mapping directly inside the root sequence.
+    Aliases, `<<` merge keys and extra documents need the full loader, so
+    those streams are handed to it instead.
+    """
+    yaml, loader, resolver = _yaml_backend()
+    hosts: list[str] = []
+    # One frame per open collection:
+    # [is_mapping, expecting_key, last_key, play hosts value]
+    stack: list[list[Any]] = []
+    documents = 0
+
+    for event in yaml.parse(stream, Loader=loader):
+        if isinstance(event, yaml.DocumentStartEvent):
+            documents += 1
+        if (
+            isinstance(event, yaml.AliasEvent)
+            or (isinstance(event, yaml.ScalarEvent) and event.value == "<<")
+            or documents > 1
+        ):
+            return _hosts_from_plays(yaml.load(stream, Loader=loader))
+        if isinstance(event, yaml.CollectionEndEvent):
+            closed = stack.pop()
+            if closed[3] is not None:
+                hosts.append(closed[3])
+            _advance_frame(stack)
+            continue
+        if not isinstance(event, yaml.NodeEvent):
+            continue
+
+        frame = stack[-1] if stack else None
+        if frame is not None and frame[0] and frame[1]:
+            frame[2] = event.value if isinstance(event, yaml.ScalarEvent) else None
+        elif (
+            frame is not None
+            and frame[0]
+            and frame[2] == "hosts"
+            and (len(stack) == 1 or (len(stack) == 2 and not stack[0][0]))
+        ):
+            # Like safe_load, a repeated `hosts` key keeps only its last value,
+            # so the play's value is recorded now and emitted when it closes.
+            frame[3] = None
+            if isinstance(event, yaml.ScalarEvent):
+                tag = event.tag
+                if tag is None or tag == "!":
+                    tag = resolver.resolve(yaml.ScalarNode, event.value, event.implicit)
+                if tag == _STR_TAG:
+                    frame[3] = event.value
+
+        if isinstance(event, yaml.CollectionStartEvent):
+            stack.append([isinstance(event, yaml.MappingStartEvent), True, None, None])
+            continue
+        _advance_frame(stack)
+
+    return hosts
+
+
+def _advance_frame(stack: list[list[Any]]) -> None:
+    if stack and stack[-1][0]:
+        stack[-1][1] = not stack[-1][1]
+
+
+def clear_caches() -> None:
+    """
+    Drop memoised PATH, path-resolution and playbook lookups, e.g. after a
+    test moves or deletes files the resolvers have already seen.
+    """
+    for cached in (
+        _which_cached,
+        _infer_project_dir,
+        resolve_playbook_path,
+        resolve_inventory_path,
+        _extract_play_hosts_cached,
+    ):
+        cached.cache_clear()
@@ -1,14 +1,66 @@
 """Pytest configuration for pytest-ansible-vagrant tests."""
 
 import os
+from unittest.mock import MagicMock
 
 import pytest
 
 
-@pytest.fixture(scope="function", autouse=True)
+def pytest_addoption(parser):
+    parser.addoption(
+        "--runintegration",
+        action="store_true",
+        default=False,
+        help="Run tests marked integration (they boot Vagrant VMs).",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--runintegration"):
+        return
+    skip = pytest.mark.skip(reason="needs --runintegration")
+    for item in items:
+        if "integration" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="module", autouse=True)
 def cd_to_test_dir(request):
-    """Change to test file's directory for relative path resolution."""
+    """
+    Change to test file's directory for relative path resolution.
+    Module-scoped: tests must not leave the CWD changed for later tests.
+    """
     original_dir = os.getcwd()
     os.chdir(request.fspath.dirname)
     yield
     os.chdir(original_dir)
+
+
+@pytest.fixture(scope="module")
+def playbook_dir(tmp_path_factory):
+    """One directory per module for playbook files; tests use unique names."""
+    return tmp_path_factory.mktemp("playbooks")
+
+
+@pytest.fixture
+def make_mock_request(tmp_path):
+    """
+    Factory for mock pytest requests whose test file lives in tmp_path/tests.
+    Keyword arguments become CLI option values; ini values are empty.
+    """
+
+    def _make(with_tests=True, with_roles=True, **options):
+        request = MagicMock()
+        request.config.getoption.side_effect = lambda name, default=None: (
+            options.get(name, default)
+        )
+        request.config.getini.return_value = ""
+        request.path = tmp_path / "tests" / "test_file.py"
+        if with_tests:
+            request.path.parent.mkdir(exist_ok=True)
+            request.path.touch()
+        if with_roles:
+            (tmp_path / "roles").mkdir(exist_ok=True)
+        return request
+
+    return _make
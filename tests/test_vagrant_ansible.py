@@ -0,0 +1,217 @@
+"""Tests for ansible helpers - unit tests without VMs."""
+
+import os
+
+import pytest
+
+from pytest_ansible_vagrant import ansible
+from pytest_ansible_vagrant.ansible import _build_inventory_content
+from pytest_ansible_vagrant.runner import SSHConfig
+
+WEB = SSHConfig(hostname="127.0.0.1", port=2222, user="vagrant", identityfile="/k/web")
+DB = SSHConfig(hostname="127.0.0.1", port=2223, user="vagrant", identityfile="/k/db")
+
+
+def test_inventory_multi_host():
+    content = _build_inventory_content({"web": WEB, "db": DB})
+    lines = content.splitlines()
+    assert lines[0] == "[vagrant]"
+    assert lines[1].startswith("web ansible_host=127.0.0.1 ansible_port=2222 ")
+    assert lines[2].startswith("db ansible_host=127.0.0.1 ansible_port=2223 ")
+    assert content.endswith("\n")
+
+
+def test_inventory_single_host_uses_play_patterns():
+    content = _build_inventory_content({"default": WEB}, ["webservers", "dbservers"])
+    lines = content.splitlines()
+    assert lines[1].startswith("webservers ansible_host=127.0.0.1 ")
+    assert lines[2].startswith("dbservers ansible_host=127.0.0.1 ")
+
+
+def test_inventory_ssh_common_args():
+    content = _build_inventory_content(
+        {"web": WEB}, None, "-o ControlPath=/tmp/cm/cm-%C"
+    )
+    assert "ansible_ssh_common_args='-o ControlPath=/tmp/cm/cm-%C'" in content
+    assert "ansible_ssh_private_key_file=/k/web" in content
+
+
+def test_control_path_fits_unix_socket_limit():
+    args = ansible._SSH_COMMON_ARGS.format(cm_dir=ansible._default_control_dir())
+    control_path = args.rsplit("ControlPath=", 1)[1]
+    # %C expands to a 40-char hash; ssh adds a ~17-char suffix while binding.
+    assert len(control_path.replace("%C", "x" * 40).encode()) < 90
+    assert os.path.isabs(control_path)
+
+
+def test_tuned_envvars_forks_cover_all_hosts(monkeypatch):
+    monkeypatch.delenv("ANSIBLE_FORKS", raising=False)
+    assert ansible._tuned_envvars()["ANSIBLE_FORKS"] == "20"
+    assert ansible._tuned_envvars(32)["ANSIBLE_FORKS"] == "32"
+
+
+def test_tuned_envvars_set_control_persist_in_ssh_args(monkeypatch):
+    monkeypatch.delenv("ANSIBLE_SSH_ARGS", raising=False)
+    ssh_args = ansible._tuned_envvars()["ANSIBLE_SSH_ARGS"]
+    assert "ControlPersist=600s" in ssh_args
+    assert "ControlPersist" not in ansible._SSH_COMMON_ARGS
+
+
+def test_tuned_envvars_respect_user_environment(monkeypatch):
+    monkeypatch.setenv("ANSIBLE_FORKS", "5")
+    monkeypatch.setenv("ANSIBLE_GATHERING", "explicit")
+    monkeypatch.setenv("ANSIBLE_SSH_ARGS", "-o ControlMaster=no")
+    envvars = ansible._tuned_envvars(32, reuse_facts=True)
+    assert "ANSIBLE_SSH_ARGS" not in envvars
+    assert "ANSIBLE_FORKS" not in envvars
+    assert "ANSIBLE_GATHERING" not in envvars
+    monkeypatch.delenv("ANSIBLE_GATHERING")
+    assert "ANSIBLE_GATHERING" not in ansible._tuned_envvars()
+
+
+def test_single_host_runner_is_deprecated(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        ansible, "run_playbook_on_vagrant_hosts", lambda **kw: calls.append(kw)
+    )
+    with pytest.warns(DeprecationWarning, match="run_playbook_on_vagrant_hosts"):
+        ansible.run_playbook_on_vagrant_host(
+            playbook="playbook.yaml",
+            project_dir="/project",
+            ssh=WEB,
+            inventory_file=None,
+            extravars=None,
+            artifact_dir=None,
+        )
+    assert calls[0]["ssh_configs"] == {"default": WEB}
+
+
+class _FakeRunner:
+    def __init__(self, config):
+        self.config = config
+
+    def run(self):
+        return "successful", 0
+
+
+def _patch_runner(monkeypatch) -> list[dict]:
+    configs: list[dict] = []
+
+    class _FakeConfig:
+        def __init__(self, **kwargs):
+            configs.append(kwargs)
+
+        def prepare(self):
+            pass
+
+    monkeypatch.setattr(ansible, "RunnerConfig", _FakeConfig)
+    monkeypatch.setattr(ansible, "Runner", _FakeRunner)
+    return configs
+
+
+def test_run_uses_artifact_dir_factory(monkeypatch, tmp_path):
+    configs = _patch_runner(monkeypatch)
+    playbook = tmp_path / "playbook.yaml"
+    playbook.write_text("- hosts: all\n  tasks: []")
+    artifact_dir = tmp_path / "artifacts"
+
+    ansible.run_playbook_on_vagrant_hosts(
+        playbook=str(playbook),
+        project_dir=str(tmp_path),
+        ssh_configs={"web": WEB},
+        inventory_file=None,
+        extravars=None,
+        artifact_dir=None,
+        artifact_dir_factory=lambda: str(artifact_dir),
+    )
+
+    assert configs[0]["artifact_dir"] == str(artifact_dir)
+    assert (artifact_dir / "inventory.ini").is_file()
+
+
+def test_run_fact_cache_only_with_key(monkeypatch, tmp_path):
+    configs = _patch_runner(monkeypatch)
+    playbook = tmp_path / "playbook.yaml"
+    playbook.write_text("- hosts: all\n  tasks: []")
+    kwargs = dict(
+        playbook=str(playbook),
+        project_dir=str(tmp_path),
+        ssh_configs={"web": WEB},
+        inventory_file=None,
+        extravars=None,
+        artifact_dir=str(tmp_path / "artifacts"),
+    )
+
+    ansible.run_playbook_on_vagrant_hosts(**kwargs)
+    ansible.run_playbook_on_vagrant_hosts(**kwargs, fact_cache_key="abc")
+
+    assert configs[0]["fact_cache"] is None
+    assert configs[1]["fact_cache"] == str(tmp_path / "artifacts" / "facts" / "abc")
+
+
+def test_run_ssh_vars_override_extravars(monkeypatch, tmp_path):
+    configs = _patch_runner(monkeypatch)
+    playbook = tmp_path / "playbook.yaml"
+    playbook.write_text("- hosts: all\n  tasks: []")
+
+    ansible.run_playbook_on_vagrant_hosts(
+        playbook=str(playbook),
+        project_dir=str(tmp_path),
+        ssh_configs={"web": WEB},
+        inventory_file="inventory.ini",
+        extravars={"my_var": "bar", "ansible_port": 22},
+        artifact_dir=str(tmp_path / "artifacts"),
+    )
+
+    assert configs[0]["envvars"]["ANSIBLE_PIPELINING"] == "True"
+    extravars = configs[0]["extravars"]
+    assert extravars["my_var"] == "bar"
+    assert extravars["ansible_port"] == 2222
+
+
+def test_run_keeps_unchanged_inventory(monkeypatch, tmp_path):
+    _patch_runner(monkeypatch)
+    playbook = tmp_path / "playbook.yaml"
+    playbook.write_text("- hosts: all\n  tasks: []")
+    artifact_dir = tmp_path / "artifacts"
+    kwargs = dict(
+        playbook=str(playbook),
+        project_dir=str(tmp_path),
+        ssh_configs={"web": WEB},
+        inventory_file=None,
+        extravars=None,
+        artifact_dir=str(artifact_dir),
+    )
+
+    ansible.run_playbook_on_vagrant_hosts(**kwargs)
+    inventory = artifact_dir / "inventory.ini"
+    mtime = inventory.stat().st_mtime_ns
+    ansible.run_playbook_on_vagrant_hosts(**kwargs)
+    assert inventory.stat().st_mtime_ns == mtime
+
+    ansible.run_playbook_on_vagrant_hosts(**{**kwargs, "ssh_configs": {"db": DB}})
+    assert "ansible_port=2223" in inventory.read_text()
+
+
+def test_run_parallel_isolates_artifacts_and_collects_failures(monkeypatch, tmp_path):
+    calls = []
+
+    def _fake_run(**kwargs):
+        calls.append(kwargs)
+        if kwargs["playbook"] == "bad.yaml":
+            raise RuntimeError("ansible-runner failed: status='failed', rc=2")
+
+    monkeypatch.setattr(ansible, "run_playbook_on_vagrant_hosts", _fake_run)
+
+    with pytest.raises(RuntimeError, match="bad.yaml: ansible-runner failed"):
+        ansible.run_playbooks_on_vagrant_hosts_parallel(
+            playbooks=["good.yaml", "bad.yaml"],
+            project_dir=str(tmp_path),
+            ssh_configs={"web": WEB},
+            inventory_file=None,
+            extravars=None,
+            artifact_dir=str(tmp_path),
+        )
+
+    artifact_dirs = sorted(c["artifact_dir"] for c in calls)
+    assert artifact_dirs == [str(tmp_path / "0"), str(tmp_path / "1")]
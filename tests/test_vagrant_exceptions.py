@@ -22,6 +22,10 @@ def test_vagrantfile_not_found_inherits():
     assert issubclass(VagrantfileNotFound, VagrantError)
 
 
+def test_vagrantfile_not_found_is_file_not_found():
+    assert issubclass(VagrantfileNotFound, FileNotFoundError)
+
+
 def test_vagrant_command_failed_inherits():
     assert issubclass(VagrantCommandFailed, VagrantError)
 
@@ -0,0 +1,38 @@
+"""Tests for plugin hooks and fixture helpers - unit tests without VMs."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from pytest_ansible_vagrant.main import _fixture_scope, _resolve_shutdown_mode
+from pytest_ansible_vagrant.runner import ShutdownMode
+
+
+def _make_config(shutdown: str) -> MagicMock:
+    config = MagicMock()
+    config.getoption.return_value = None
+    config.getini.return_value = shutdown
+    return config
+
+
+def test_shutdown_mode_from_ini():
+    assert _resolve_shutdown_mode(_make_config(" Halt ")) is ShutdownMode.HALT
+
+
+def test_shutdown_mode_defaults_to_none():
+    assert _resolve_shutdown_mode(_make_config("")) is ShutdownMode.NONE
+
+
+def test_shutdown_mode_invalid():
+    with pytest.raises(pytest.UsageError, match="Invalid vagrant_shutdown 'reboot'"):
+        _resolve_shutdown_mode(_make_config("reboot"))
+
+
+def test_fixture_scope_defaults_to_module():
+    assert _fixture_scope("vagrant_runner", _make_config("")) == "module"
+    assert _fixture_scope("vagrant_runner", _make_config("Session")) == "session"
+
+
+def test_fixture_scope_invalid():
+    with pytest.raises(pytest.UsageError, match="Invalid vagrant_scope 'function'"):
+        _fixture_scope("vagrant_runner", _make_config("function"))
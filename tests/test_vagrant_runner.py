@@ -1,12 +1,18 @@
 """Tests for VagrantRunner - unit tests without VMs."""
 
+import os
+import socket
+import subprocess
 from pathlib import Path
 from unittest.mock import MagicMock
 
 import pytest
+import yaml
 
-from pytest_ansible_vagrant import VagrantRunner
+from pytest_ansible_vagrant import VagrantRunner, VagrantfileNotFound
+from pytest_ansible_vagrant import runner as runner_mod
 from pytest_ansible_vagrant.runner import (
+    SSHConfig,
     _from_ssh_config,
     _from_ssh_config_multi,
     _parse_ssh_config_block,
@@ -15,87 +21,99 @@ from pytest_ansible_vagrant.runner import (
 
 TESTS_DIR = Path(__file__).parent
 
+SSH_CONFIG_MULTI = """
+Host web
+  HostName 127.0.0.1
+  User vagrant
+  Port 2222
+  IdentityFile /path/to/web/key
 
-def _make_mock_request(tmp_path: Path) -> MagicMock:
-    """Create a mock pytest request with valid project layout."""
-    mock_request = MagicMock()
-    mock_request.config.getoption.return_value = None
-    mock_request.config.getini.return_value = ""
-    mock_request.path = tmp_path / "tests" / "test_file.py"
-
-    (tmp_path / "roles").mkdir()
-    (tmp_path / "tests").mkdir()
-    (tmp_path / "tests" / "test_file.py").touch()
-
-    return mock_request
+Host db
+  HostName 127.0.0.1
+  User vagrant
+  Port 2223
+  IdentityFile /path/to/db/key
+"""
 
 
-def test_runner_init(tmp_path):
-    mock_request = _make_mock_request(tmp_path)
+def test_runner_init(tmp_path, make_mock_request):
+    mock_request = make_mock_request()
     runner = VagrantRunner(mock_request)
     assert runner._default_project_dir == str(tmp_path)
 
 
-def test_runner_vagrantfile_not_found(tmp_path):
-    mock_request = _make_mock_request(tmp_path)
+def test_runner_parallel_setting(make_mock_request):
+    assert VagrantRunner(make_mock_request()).parallel is True
+    assert VagrantRunner(make_mock_request(vagrant_no_parallel=True)).parallel is False
+
+
+def test_runner_vagrantfile_not_found(tmp_path, make_mock_request):
+    mock_request = make_mock_request()
     runner = VagrantRunner(mock_request)
 
     playbook = tmp_path / "playbook.yaml"
     playbook.touch()
 
-    with pytest.raises(FileNotFoundError, match="Vagrantfile not found"):
+    with pytest.raises(VagrantfileNotFound, match="Vagrantfile not found"):
         runner("playbook.yaml", vagrant_file="nonexistent/Vagrantfile")
 
 
-def test_runner_host_before_invocation(tmp_path):
-    mock_request = _make_mock_request(tmp_path)
+def test_runner_host_before_invocation(make_mock_request):
+    mock_request = make_mock_request()
     runner = VagrantRunner(mock_request)
 
     with pytest.raises(RuntimeError, match="VagrantRunner has not been invoked yet"):
         _ = runner.host
 
 
-def test_runner_hosts_before_invocation(tmp_path):
-    mock_request = _make_mock_request(tmp_path)
+def test_runner_hosts_before_invocation(make_mock_request):
+    mock_request = make_mock_request()
     runner = VagrantRunner(mock_request)
 
     with pytest.raises(RuntimeError, match="VagrantRunner has not been invoked yet"):
         _ = runner.hosts
 
 
-def test_runner_get_host_before_invocation(tmp_path):
-    mock_request = _make_mock_request(tmp_path)
+def test_runner_get_host_before_invocation(make_mock_request):
+    mock_request = make_mock_request()
     runner = VagrantRunner(mock_request)
 
     with pytest.raises(RuntimeError, match="VagrantRunner has not been invoked yet"):
         runner.get_host("web")
 
 
-def test_runner_ssh_configs_before_invocation(tmp_path):
-    mock_request = _make_mock_request(tmp_path)
+def test_runner_ssh_configs_before_invocation(make_mock_request):
+    mock_request = make_mock_request()
     runner = VagrantRunner(mock_request)
 
     with pytest.raises(RuntimeError, match="VagrantRunner has not been invoked yet"):
         _ = runner.ssh_configs
 
 
-def test_runner_invalid_layout_no_roles(tmp_path):
-    mock_request = MagicMock()
-    mock_request.config.getoption.return_value = str(tmp_path)
-    mock_request.config.getini.return_value = ""
-
-    (tmp_path / "tests").mkdir()
+def test_runner_invalid_layout_no_roles(tmp_path, make_mock_request):
+    mock_request = make_mock_request(
+        with_roles=False, vagrant_project_dir=str(tmp_path)
+    )
 
     with pytest.raises(AssertionError, match="Invalid ansible project layout"):
         VagrantRunner(mock_request)
 
 
-def test_runner_invalid_layout_no_tests(tmp_path):
-    mock_request = MagicMock()
-    mock_request.config.getoption.return_value = str(tmp_path)
-    mock_request.config.getini.return_value = ""
+def test_runner_invalid_layout_no_tests(tmp_path, make_mock_request):
+    mock_request = make_mock_request(
+        with_tests=False, vagrant_project_dir=str(tmp_path)
+    )
 
-    (tmp_path / "roles").mkdir()
+    with pytest.raises(AssertionError, match="Invalid ansible project layout"):
+        VagrantRunner(mock_request)
+
+
+def test_runner_invalid_layout_missing_project_dir(tmp_path, make_mock_request):
+    mock_request = make_mock_request(
+        with_tests=False,
+        with_roles=False,
+        vagrant_project_dir=str(tmp_path / "missing"),
+    )
 
     with pytest.raises(AssertionError, match="Invalid ansible project layout"):
         VagrantRunner(mock_request)
@@ -116,19 +134,33 @@ Host default
     assert result["identityfile"] == "/path/to/key"
 
 
-def test_parse_ssh_config_quoted_values():
-    config_text = """
+@pytest.mark.parametrize("quote", ["", '"', "'"])
+def test_parse_ssh_config_quoted_values(quote):
+    config_text = f"""
 Host default
-  HostName "127.0.0.1"
-  User 'vagrant'
+  HostName {quote}127.0.0.1{quote}
+  User {quote}vagrant{quote}
   Port 2222
-  IdentityFile "/path/to/key"
+  IdentityFile {quote}/path/to/key{quote}
 """
     result = _from_ssh_config(config_text)
     assert result["hostname"] == "127.0.0.1"
+    assert result["user"] == "vagrant"
     assert result["identityfile"] == "/path/to/key"
 
 
+@pytest.mark.parametrize("quote", ['"', "'"])
+def test_parse_ssh_config_lone_quote_kept(quote):
+    config_text = f"""
+Host default
+  HostName 127.0.0.1
+  User {quote}
+  Port 2222
+  IdentityFile /path/to/key
+"""
+    assert _from_ssh_config(config_text)["user"] == quote
+
+
 def test_parse_ssh_config_empty():
     with pytest.raises(ValueError, match="ssh-config contains no valid host blocks"):
         _from_ssh_config("")
@@ -145,20 +177,7 @@ Host default
 
 
 def test_parse_ssh_config_multi():
-    config_text = """
-Host web
-  HostName 127.0.0.1
-  User vagrant
-  Port 2222
-  IdentityFile /path/to/web/key
-
-Host db
-  HostName 127.0.0.1
-  User vagrant
-  Port 2223
-  IdentityFile /path/to/db/key
-"""
-    result = _from_ssh_config_multi(config_text)
+    result = _from_ssh_config_multi(SSH_CONFIG_MULTI)
     assert len(result) == 2
     assert "web" in result
     assert "db" in result
@@ -184,9 +203,24 @@ def test_parse_ssh_config_multi_empty():
     assert result == {}
 
 
-def test_parse_ssh_config_block_missing_hostname():
-    fields = {"user": "vagrant", "port": "2222", "identityfile": "/path"}
-    with pytest.raises(ValueError, match="HostName"):
+@pytest.mark.parametrize(
+    "missing,name",
+    [
+        ("hostname", "HostName"),
+        ("user", "User"),
+        ("port", "Port"),
+        ("identityfile", "IdentityFile"),
+    ],
+)
+def test_parse_ssh_config_block_missing_field(missing, name):
+    fields = {
+        "hostname": "127.0.0.1",
+        "user": "vagrant",
+        "port": "2222",
+        "identityfile": "/path",
+    }
+    del fields[missing]
+    with pytest.raises(ValueError, match=f"ssh-config missing: {name}$"):
         _parse_ssh_config_block(fields)
 
 
@@ -199,3 +233,278 @@ def test_parse_ssh_config_block_invalid_port():
     }
     with pytest.raises(ValueError, match="invalid Port"):
         _parse_ssh_config_block(fields)
+
+
+def _record_vagrant_calls(monkeypatch) -> list[list[str]]:
+    calls: list[list[str]] = []
+
+    def _fake_run(cmd, vagrantfile, check=True, capture=True):
+        calls.append(cmd)
+        return MagicMock(returncode=0, stdout=SSH_CONFIG_MULTI.encode())
+
+    monkeypatch.setattr(runner_mod, "_run", _fake_run)
+    monkeypatch.setattr(runner_mod, "require_bins", lambda *bins: None)
+    monkeypatch.delenv("VAGRANT_NO_PARALLEL", raising=False)
+    return calls
+
+
+def test_up_parallel_by_default(monkeypatch):
+    calls = _record_vagrant_calls(monkeypatch)
+    runner_mod.up("Vagrantfile", provider="libvirt")
+    assert calls == [["up", "--provider", "libvirt", "--parallel"]]
+
+
+def test_up_parallel_disabled_by_env(monkeypatch):
+    calls = _record_vagrant_calls(monkeypatch)
+    monkeypatch.setenv("VAGRANT_NO_PARALLEL", "1")
+    runner_mod.up("Vagrantfile", provider="libvirt")
+    runner_mod.destroy("Vagrantfile")
+    assert calls == [
+        ["up", "--provider", "libvirt", "--no-parallel"],
+        ["destroy", "-f"],
+    ]
+
+
+def test_up_parallel_disabled_by_setting(monkeypatch):
+    calls = _record_vagrant_calls(monkeypatch)
+    runner_mod.up("Vagrantfile", provider="libvirt", parallel=False)
+    assert calls == [["up", "--provider", "libvirt", "--no-parallel"]]
+
+
+def test_env_flags_need_truthy_values(monkeypatch):
+    calls = _record_vagrant_calls(monkeypatch)
+    monkeypatch.setenv("VAGRANT_NO_PARALLEL", "0")
+    monkeypatch.setenv("PAV_PARALLEL_UP", "false")
+    runner_mod.up("Vagrantfile", provider="libvirt")
+    assert calls == [["up", "--provider", "libvirt", "--parallel"]]
+
+
+def test_destroy_parallel_requires_force(monkeypatch):
+    calls = _record_vagrant_calls(monkeypatch)
+    runner_mod.destroy("Vagrantfile")
+    runner_mod.destroy("Vagrantfile", force=False)
+    assert calls == [["destroy", "-f", "--parallel"], ["destroy"]]
+
+
+def test_up_per_machine_when_opted_in(monkeypatch):
+    calls = _record_vagrant_calls(monkeypatch)
+    status = (
+        b"1700000000,web,provider-name,virtualbox\n"
+        b"1700000000,web,state,not_created\n"
+        b"1700000000,db,state,not_created\n"
+        b"1700000000,,ui,info,Current machine states:\n"
+    )
+    monkeypatch.setattr(
+        runner_mod,
+        "_run",
+        lambda cmd, vagrantfile, check=True, capture=True: (
+            calls.append(cmd) or MagicMock(returncode=0, stdout=status)
+        ),
+    )
+    monkeypatch.setenv("PAV_PARALLEL_UP", "1")
+
+    runner_mod.up("Vagrantfile")
+    assert calls[0] == ["status", "--machine-readable"]
+    assert sorted(calls[1:]) == [
+        ["up", "--provider", "virtualbox", "db"],
+        ["up", "--provider", "virtualbox", "web"],
+    ]
+
+
+def test_halt_fans_out_per_machine(monkeypatch):
+    calls = _record_vagrant_calls(monkeypatch)
+    runner_mod.halt("Vagrantfile", ["web", "db"])
+    runner_mod.halt("Vagrantfile", ["web"])
+    assert sorted(calls) == [["halt"], ["halt", "db"], ["halt", "web"]]
+
+    calls.clear()
+    monkeypatch.setenv("VAGRANT_NO_PARALLEL", "1")
+    runner_mod.halt("Vagrantfile", ["web", "db"])
+    assert calls == [["halt"]]
+
+
+def test_ssh_config_cached_until_halt(monkeypatch, tmp_path):
+    calls = _record_vagrant_calls(monkeypatch)
+    vagrantfile = tmp_path / "Vagrantfile"
+    vagrantfile.touch()
+
+    assert list(runner_mod.ssh_config_all(str(vagrantfile))) == ["web", "db"]
+    assert runner_mod.ssh_config(str(vagrantfile), "db")["port"] == 2223
+    assert calls == [["ssh-config"]]
+
+    runner_mod.halt(str(tmp_path / "Vagrantfile.other"))
+    runner_mod.ssh_config(str(vagrantfile))
+    assert calls == [["ssh-config"], ["halt"]]
+
+    calls.clear()
+    runner_mod.halt(str(vagrantfile))
+    runner_mod.ssh_config(str(vagrantfile))
+    assert calls == [["halt"], ["ssh-config"]]
+
+
+def test_parse_ssh_config_first_valid_block():
+    config_text = """
+Host broken
+  User vagrant
+
+Host web
+  HostName 10.0.0.5
+  User vagrant
+  Port 22
+  IdentityFile /path/to/web/key
+"""
+    result = _from_ssh_config(config_text)
+    assert result["hostname"] == "10.0.0.5"
+
+
+def test_env_for_file(monkeypatch, tmp_path):
+    monkeypatch.setenv("DEBIAN_FRONTEND", "readline")
+    env = runner_mod._env_for_file(str(tmp_path / "Vagrantfile.multihost"))
+    assert env["VAGRANT_CWD"] == str(tmp_path)
+    assert env["VAGRANT_VAGRANTFILE"] == "Vagrantfile.multihost"
+    assert env["PYTHONUNBUFFERED"] == "1"
+    assert env["DEBIAN_FRONTEND"] == "readline"
+
+
+def test_build_host_uses_control_master(tmp_path):
+    cfg = SSHConfig(
+        hostname="127.0.0.1", port=2222, user="vagrant", identityfile="/k/web"
+    )
+    host = runner_mod._build_host(cfg, str(tmp_path))
+    assert host.backend.controlpath == str(tmp_path / "127.0.0.1-2222")
+    assert host.backend.controlpersist == 600
+
+
+def test_runner_close_exits_control_masters(monkeypatch, make_mock_request):
+    runner = VagrantRunner(make_mock_request())
+    cm_dir = runner._control_dir()
+    master = socket.socket(socket.AF_UNIX)
+    master.bind(os.path.join(cm_dir, "cm-abc"))
+    Path(cm_dir, "not-a-socket").touch()
+    calls = []
+    monkeypatch.setattr(runner_mod, "_which_cached", lambda name: "/usr/bin/ssh")
+    monkeypatch.setattr(
+        runner_mod.subprocess, "run", lambda cmd, **kw: calls.append(cmd)
+    )
+
+    try:
+        runner.close()
+    finally:
+        master.close()
+    assert calls == [["ssh", "-o", f"ControlPath={cm_dir}/cm-abc", "-O", "exit", "pav"]]
+
+
+def test_runner_close_removes_control_dir(make_mock_request):
+    runner = VagrantRunner(make_mock_request())
+    cm_dir = runner._control_dir()
+    assert Path(cm_dir).is_dir()
+    runner.close()
+    assert not Path(cm_dir).exists()
+    runner.close()
+
+
+def test_run_inherits_output_when_not_capturing(monkeypatch, tmp_path, capfd):
+    script = tmp_path / "vagrant"
+    script.write_text("#!/bin/sh\necho booting $1\necho oops >&2\nexit 3\n")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    cp = runner_mod._run(["up"], "Vagrantfile", check=False, capture=False)
+    assert cp.returncode == 3
+    assert cp.stdout is None
+    assert capfd.readouterr() == ("booting up\n", "oops\n")
+    with pytest.raises(subprocess.CalledProcessError):
+        runner_mod._run(["up"], "Vagrantfile", capture=False)
+
+
+def test_ensure_up_skips_started_until_halt(monkeypatch, tmp_path):
+    calls = _record_vagrant_calls(monkeypatch)
+    vagrantfile = str(tmp_path / "Vagrantfile")
+
+    runner_mod._ensure_up(vagrantfile, "libvirt", parallel=False)
+    runner_mod._ensure_up(vagrantfile, "libvirt", parallel=False)
+    assert calls == [["up", "--provider", "libvirt", "--no-parallel"]]
+
+    runner_mod.halt(vagrantfile)
+    runner_mod._ensure_up(vagrantfile, "libvirt", parallel=False)
+    assert calls[-2:] == [["halt"], ["up", "--provider", "libvirt", "--no-parallel"]]
+
+
+def test_fact_cache_key_tracks_machine_ids(tmp_path):
+    vagrantfile = tmp_path / "Vagrantfile"
+    vagrantfile.touch()
+    id_file = tmp_path / ".vagrant" / "machines" / "web" / "libvirt" / "id"
+    id_file.parent.mkdir(parents=True)
+    id_file.write_text("first")
+    key = runner_mod._fact_cache_key(str(vagrantfile))
+
+    assert runner_mod._fact_cache_key(str(vagrantfile)) == key
+    id_file.write_text("recreated")
+    assert runner_mod._fact_cache_key(str(vagrantfile)) != key
+
+
+def test_parse_ssh_config_crlf_and_unrelated_keys():
+    config_text = SSH_CONFIG_MULTI.replace("\n", "\r\n").replace(
+        "  Port 2222", "  UserKnownHostsFile /dev/null\r\n  Port 2222"
+    )
+    result = _from_ssh_config_multi(config_text)
+    assert result["web"]["port"] == 2222
+    assert result["db"]["identityfile"] == "/path/to/db/key"
+
+
+def test_runner_parses_playbook_before_up(monkeypatch, tmp_path, make_mock_request):
+    calls = _record_vagrant_calls(monkeypatch)
+    runner = VagrantRunner(make_mock_request())
+    (tmp_path / "Vagrantfile").touch()
+    (tmp_path / "playbook.yaml").write_text("- hosts: [unclosed\n")
+
+    with pytest.raises(yaml.YAMLError):
+        runner("playbook.yaml")
+    assert calls == []
+
+
+def test_parse_ssh_config_first_value_wins():
+    config_text = SSH_CONFIG_MULTI.replace(
+        "/path/to/web/key", "/path/to/web/key\n  Port 2200\n  IdentityFile /other"
+    )
+    result = _from_ssh_config_multi(config_text)
+    assert result["web"]["port"] == 2222
+    assert result["web"]["identityfile"] == "/path/to/web/key"
+
+
+def test_ssh_config_refreshed_when_machine_recreated(monkeypatch, tmp_path):
+    calls = _record_vagrant_calls(monkeypatch)
+    vagrantfile = tmp_path / "Vagrantfile"
+    vagrantfile.touch()
+    machine = tmp_path / ".vagrant" / "machines" / "web" / "libvirt"
+    machine.mkdir(parents=True)
+    (machine / "id").write_text("one")
+
+    runner_mod.ssh_config_all(str(vagrantfile))
+    runner_mod.ssh_config_all(str(vagrantfile))
+    assert calls == [["ssh-config"]]
+
+    stat = (machine / "id").stat()
+    os.utime(machine / "id", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    runner_mod.ssh_config_all(str(vagrantfile))
+    assert calls == [["ssh-config"], ["ssh-config"]]
+
+
+def test_runner_reset_keeps_used_vagrantfiles(monkeypatch, tmp_path, make_mock_request):
+    calls = _record_vagrant_calls(monkeypatch)
+    monkeypatch.setattr(
+        "pytest_ansible_vagrant.ansible.run_playbook_on_vagrant_hosts",
+        lambda **kw: None,
+    )
+    runner = VagrantRunner(make_mock_request())
+    (tmp_path / "Vagrantfile").touch()
+    (tmp_path / "playbook.yaml").write_text("- hosts: all\n")
+
+    runner("playbook.yaml", target_host="db")
+    assert runner.host is runner.get_host("db")
+    runner.reset()
+    with pytest.raises(RuntimeError, match="has not been invoked yet"):
+        _ = runner.host
+    assert runner.vagrantfiles == {str(tmp_path / "Vagrantfile"): ("web", "db")}
+    assert calls[-1] == ["ssh-config"]
+    runner.close()
@@ -1,8 +1,16 @@
 """Tests for utility functions."""
 
+import os
+from unittest.mock import MagicMock
+
 import pytest
+import yaml
 
+from pytest_ansible_vagrant import utilities
 from pytest_ansible_vagrant.utilities import (
+    infer_project_dir_from_request,
+    is_project_layout,
+    read_setting,
     require_bins,
     resolve_playbook_path,
     resolve_inventory_path,
@@ -26,22 +34,36 @@ def test_require_bins_missing_multiple():
         require_bins("python", "nonexistent_a", "nonexistent_b")
 
 
+def test_require_bins_caches_lookups(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(
+        utilities.shutil, "which", lambda name: lookups.append(name) or "/bin/x"
+    )
+    utilities._which_cached.cache_clear()
+    try:
+        require_bins("pav_cached_bin")
+        require_bins("pav_cached_bin")
+    finally:
+        utilities._which_cached.cache_clear()
+    assert lookups == ["pav_cached_bin"]
+
+
 def test_resolve_playbook_absolute_exists(tmp_path):
     playbook = tmp_path / "test.yaml"
     playbook.touch()
-    result = resolve_playbook_path(str(tmp_path), str(playbook))
+    result = resolve_playbook_path(tmp_path, playbook)
     assert result == str(playbook)
 
 
 def test_resolve_playbook_absolute_not_found(tmp_path):
     with pytest.raises(FileNotFoundError, match="playbook not found"):
-        resolve_playbook_path(str(tmp_path), "/nonexistent/playbook.yaml")
+        resolve_playbook_path(tmp_path, "/nonexistent/playbook.yaml")
 
 
 def test_resolve_playbook_relative_exists(tmp_path):
     playbook = tmp_path / "playbook.yaml"
     playbook.touch()
-    result = resolve_playbook_path(str(tmp_path), "playbook.yaml")
+    result = resolve_playbook_path(tmp_path, "playbook.yaml")
     assert result == str(playbook)
 
 
@@ -49,45 +71,57 @@ def test_resolve_playbook_relative_not_found(tmp_path):
     with pytest.raises(
         FileNotFoundError, match="playbook not found relative to project_dir"
     ):
-        resolve_playbook_path(str(tmp_path), "missing.yaml")
+        resolve_playbook_path(tmp_path, "missing.yaml")
+
+
+def test_clear_caches_forgets_resolved_paths(tmp_path):
+    playbook = tmp_path / "test.yaml"
+    playbook.touch()
+    assert resolve_playbook_path(tmp_path, "test.yaml") == str(playbook)
+    playbook.unlink()
+    assert resolve_playbook_path(tmp_path, "test.yaml") == str(playbook)
+
+    utilities.clear_caches()
+    with pytest.raises(FileNotFoundError, match="playbook not found"):
+        resolve_playbook_path(tmp_path, "test.yaml")
 
 
 def test_resolve_inventory_none(tmp_path):
-    result = resolve_inventory_path(str(tmp_path), None)
+    result = resolve_inventory_path(tmp_path, None)
     assert result is None
 
 
 def test_resolve_inventory_empty_string(tmp_path):
-    result = resolve_inventory_path(str(tmp_path), "")
+    result = resolve_inventory_path(tmp_path, "")
     assert result is None
 
 
 def test_resolve_inventory_absolute_path(tmp_path):
-    result = resolve_inventory_path(str(tmp_path), "/etc/ansible/hosts")
+    result = resolve_inventory_path(tmp_path, "/etc/ansible/hosts")
     assert result == "/etc/ansible/hosts"
 
 
 def test_resolve_inventory_relative_exists(tmp_path):
     inv = tmp_path / "inventory.ini"
     inv.touch()
-    result = resolve_inventory_path(str(tmp_path), "inventory.ini")
+    result = resolve_inventory_path(tmp_path, "inventory.ini")
     assert result == str(inv)
 
 
 def test_resolve_inventory_host_list_pattern(tmp_path):
-    result = resolve_inventory_path(str(tmp_path), "host1,host2,")
+    result = resolve_inventory_path(tmp_path, "host1,host2,")
     assert result == "host1,host2,"
 
 
-def test_extract_hosts_single_play(tmp_path):
-    playbook = tmp_path / "test.yaml"
+def test_extract_hosts_single_play(playbook_dir):
+    playbook = playbook_dir / "single.yaml"
     playbook.write_text("- hosts: webservers\n  tasks: []")
     result = extract_play_hosts(str(playbook))
     assert result == ["webservers"]
 
 
-def test_extract_hosts_multiple_plays(tmp_path):
-    playbook = tmp_path / "test.yaml"
+def test_extract_hosts_multiple_plays(playbook_dir):
+    playbook = playbook_dir / "multi.yaml"
     playbook.write_text(
         "- hosts: webservers\n  tasks: []\n"
         "- hosts: dbservers\n  tasks: []\n"
@@ -97,15 +131,136 @@ def test_extract_hosts_multiple_plays(tmp_path):
     assert result == ["webservers", "dbservers"]
 
 
-def test_extract_hosts_empty_playbook(tmp_path):
-    playbook = tmp_path / "test.yaml"
+def test_extract_hosts_empty_playbook(playbook_dir):
+    playbook = playbook_dir / "empty.yaml"
     playbook.write_text("")
     result = extract_play_hosts(str(playbook))
     assert result == []
 
 
-def test_extract_hosts_no_hosts_key(tmp_path):
-    playbook = tmp_path / "test.yaml"
+def test_extract_hosts_no_hosts_key(playbook_dir):
+    playbook = playbook_dir / "no_hosts.yaml"
     playbook.write_text("- tasks: []")
     result = extract_play_hosts(str(playbook))
     assert result == []
+
+
+def test_extract_hosts_reparses_on_change(playbook_dir):
+    playbook = playbook_dir / "changing.yaml"
+    playbook.write_text("- hosts: webservers\n  tasks: []")
+    assert extract_play_hosts(str(playbook)) == ["webservers"]
+    playbook.write_text("- hosts: dbservers_and_more\n  tasks: []")
+    assert extract_play_hosts(str(playbook)) == ["dbservers_and_more"]
+
+
+def test_extract_hosts_relative_path_keyed_by_abspath(tmp_path, monkeypatch):
+    for name in ("one", "two"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "play.yaml").write_text(f"- hosts: {name}\n")
+        os.utime(tmp_path / name / "play.yaml", ns=(0, 0))
+
+    monkeypatch.chdir(tmp_path / "one")
+    assert extract_play_hosts("play.yaml") == ["one"]
+    monkeypatch.chdir(tmp_path / "two")
+    assert extract_play_hosts("play.yaml") == ["two"]
+
+
+def test_extract_hosts_ignores_nested_and_non_string(playbook_dir):
+    playbook = playbook_dir / "nested.yaml"
+    playbook.write_text(
+        "- hosts: webservers\n"
+        "  vars: {hosts: nested}\n"
+        "  tasks:\n"
+        "    - hosts: task_level\n"
+        "- hosts: [listed]\n"
+        "- hosts: 123\n"
+        "- name: db\n"
+        "  hosts: dbservers\n"
+    )
+    result = extract_play_hosts(str(playbook))
+    assert result == ["webservers", "dbservers"]
+
+
+def test_extract_hosts_resolves_aliases_and_merge_keys(playbook_dir):
+    playbook = playbook_dir / "anchors.yaml"
+    playbook.write_text(
+        "- hosts: a\n  vars: {group: &web web}\n"
+        "- hosts: *web\n"
+        "- &base {hosts: db, tasks: []}\n"
+        "- <<: *base\n  name: merged\n"
+    )
+    assert extract_play_hosts(str(playbook)) == ["a", "web", "db"]
+
+    playbook.write_text("- &base {hosts: db}\n- <<: *base\n  hosts: merged\n")
+    assert extract_play_hosts(str(playbook)) == ["db", "merged"]
+
+
+def test_extract_hosts_repeated_key_keeps_last(playbook_dir):
+    playbook = playbook_dir / "repeated.yaml"
+    playbook.write_text("- hosts: a\n  hosts: b\n- hosts: c\n  hosts: [d]\n")
+    assert extract_play_hosts(str(playbook)) == ["b"]
+
+
+def test_extract_hosts_rejects_multiple_documents(playbook_dir):
+    playbook = playbook_dir / "multi_doc.yaml"
+    playbook.write_text("- hosts: a\n---\n- hosts: b\n")
+    with pytest.raises(yaml.YAMLError):
+        extract_play_hosts(str(playbook))
+
+
+def test_read_setting_prefers_cli_and_caches():
+    config = MagicMock()
+    config.getoption.return_value = " libvirt "
+    config.getini.return_value = "virtualbox"
+    assert read_setting(config, "vagrant_provider") == "libvirt"
+    assert read_setting(config, "vagrant_provider") == "libvirt"
+    config.getoption.assert_called_once()
+
+
+def test_read_setting_falls_back_to_ini():
+    config = MagicMock()
+    config.getoption.return_value = None
+    config.getini.return_value = "halt"
+    assert read_setting(config, "vagrant_shutdown") == "halt"
+
+
+def test_extract_hosts_json_playbook(playbook_dir):
+    playbook = playbook_dir / "playbook.json"
+    playbook.write_text(
+        '[{"hosts": "webservers", "tasks": []}, {"hosts": "dbservers"}, {"tasks": []}]'
+    )
+    result = extract_play_hosts(str(playbook))
+    assert result == ["webservers", "dbservers"]
+
+
+def test_is_project_layout(tmp_path):
+    assert not is_project_layout(str(tmp_path / "missing"))
+    (tmp_path / "tests").mkdir()
+    assert not is_project_layout(str(tmp_path))
+    (tmp_path / "real_roles").mkdir()
+    (tmp_path / "roles").symlink_to(tmp_path / "real_roles")
+    assert is_project_layout(str(tmp_path))
+
+
+def test_infer_project_dir_nearest_tests(tmp_path):
+    request = MagicMock()
+    request.path = tmp_path / "proj" / "tests" / "tests" / "test_x.py"
+    assert infer_project_dir_from_request(request) == str(tmp_path / "proj" / "tests")
+
+
+def test_infer_project_dir_fallback(tmp_path):
+    request = MagicMock()
+    request.path = tmp_path / "a" / "b" / "test_x.py"
+    assert infer_project_dir_from_request(request) == str(tmp_path / "a")
+
+
+def test_infer_project_dir_session_scope_uses_rootdir(tmp_path):
+    request = MagicMock(spec=["config"])
+    request.config.rootpath = tmp_path / "tests"
+    assert infer_project_dir_from_request(request) == str(tmp_path)
+
+
+def test_infer_project_dir_session_scope_rootdir_is_project(tmp_path):
+    request = MagicMock(spec=["config"])
+    request.config.rootpath = tmp_path / "proj"
+    assert infer_project_dir_from_request(request) == str(tmp_path / "proj")
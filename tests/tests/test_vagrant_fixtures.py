@@ -16,25 +16,30 @@ def test_fixture_type(vagrant_runner: VagrantRunner):
 
 
 @pytest.mark.integration
-def test_simple_playbook(vagrant_runner: VagrantRunner):
-    """Test basic playbook run with libvirt provider."""
+@pytest.mark.parametrize(
+    "playbook,inventory_file,extravars,expected",
+    [
+        ("playbook.yaml", None, None, "/etc/foofile"),
+        (
+            "tests/playbook-with-inventory.yaml",
+            "tests/inventory.ini",
+            {"my_var": "bar"},
+            "/etc/barfile",
+        ),
+    ],
+    ids=["simple", "inventory"],
+)
+def test_playbook(
+    vagrant_runner: VagrantRunner, playbook, inventory_file, extravars, expected
+):
+    """Test playbook runs on one libvirt VM, with and without a custom inventory."""
     host = vagrant_runner(
-        "playbook.yaml",
+        playbook,
         vagrant_file="Vagrantfile.libvirt",
+        inventory_file=inventory_file,
+        extravars=extravars,
     )
-    assert host.file("/etc/foofile").is_file
-
-
-@pytest.mark.integration
-def test_playbook_with_inventory(vagrant_runner: VagrantRunner):
-    """Test playbook with custom inventory and extravars."""
-    host = vagrant_runner(
-        "tests/playbook-with-inventory.yaml",
-        vagrant_file="Vagrantfile.libvirt",
-        inventory_file="tests/inventory.ini",
-        extravars={"my_var": "bar"},
-    )
-    assert host.file("/etc/barfile").is_file
+    assert host.file(expected).is_file
 
 
 @pytest.mark.integration